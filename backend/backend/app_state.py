@@ -3,6 +3,7 @@ from pathlib import Path
 from typing import Any
 
 from loguru import logger
+from pydantic import ValidationError
 
 from backend.config import IndexingError, Metadata, Settings, configure_logging
 from backend.croissant_store import CroissantStore, get_croissant_store
@@ -16,6 +17,23 @@ from backend.indexing import (
 from backend.indices import FainderIndex, HnswIndex, TantivyIndex
 from backend.utils import load_json
 
+# Magic number at the start of the zstd frames of the Fainder index files
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def _check_index_file(path: Path, name: str, magic: bytes = b"") -> None:
+    """Check that an index file exists and starts like a valid file of its format.
+
+    FainderIndex and HnswIndex load their files on first use, so a missing or empty file
+    would otherwise only fail on the first query instead of triggering a recreation at startup.
+    """
+    if not path.exists():
+        raise FileNotFoundError(f"{name} not found at {path}")
+    with path.open("rb") as file:
+        header = file.read(max(len(magic), 1))
+    if not header or not header.startswith(magic):
+        raise IndexingError(f"{name} at {path} is empty or corrupt")
+
 
 @dataclass
 class InitializedComponents:
@@ -79,7 +97,7 @@ class ApplicationState:
                 (metadata, croissant_store, tantivy_index, fainder_index, hnsw_index, engine) = (
                     self._load_indices(settings, all_config_names)
                 )
-            except (FileNotFoundError, IndexingError) as e:
+            except (FileNotFoundError, IndexingError, ValidationError) as e:
                 logger.warning("Failed to load indices: {}. Recreating...", e)
                 (metadata, croissant_store, tantivy_index, fainder_index, hnsw_index, engine) = (
                     self._recreate_indices(settings, all_config_names)
@@ -168,16 +186,15 @@ class ApplicationState:
             # Use configuration-specific paths
             rebinning_path = settings.fainder_rebinning_path_for_config(config_name)
             conversion_path = settings.fainder_conversion_path_for_config(config_name)
-            if not rebinning_path.exists() or not conversion_path.exists():
-                raise FileNotFoundError(
-                    f"Rebinning index for configuration '{config_name}' not found"
-                )
-            if not conversion_path.exists():
-                raise FileNotFoundError(
-                    f"Conversion index for configuration '{config_name}' not found"
-                )
+            _check_index_file(
+                rebinning_path, f"Rebinning index for configuration '{config_name}'", ZSTD_MAGIC
+            )
+            _check_index_file(
+                conversion_path, f"Conversion index for configuration '{config_name}'", ZSTD_MAGIC
+            )
             rebinning_paths[config_name] = rebinning_path
             conversion_paths[config_name] = conversion_path
+        _check_index_file(settings.histogram_path, "Histograms", ZSTD_MAGIC)
 
         fainder_index = FainderIndex(
             rebinning_paths=rebinning_paths,
@@ -186,9 +203,12 @@ class ApplicationState:
             num_workers=settings.fainder_num_workers,
             chunk_layout=settings.fainder_chunk_layout,
             num_chunks=settings.fainder_num_chunks,
+            cache_size=settings.fainder_cache_size,
         )
 
         logger.info("Initializing HNSW index")
+        if settings.use_embeddings:
+            _check_index_file(settings.hnsw_index_path, "HNSW index")
         hnsw_index = HnswIndex(
             settings.hnsw_index_path,
             metadata,
@@ -220,6 +240,8 @@ class ApplicationState:
             croissant_path=settings.croissant_path,
             metadata_path=settings.metadata_path,
             tantivy_path=settings.tantivy_path,
+            return_documents=False,
+            hists_on_disk=True,
         )
 
         with settings.metadata_path.open("rb") as f:
@@ -301,6 +323,7 @@ class ApplicationState:
             num_workers=settings.fainder_num_workers,
             num_chunks=settings.fainder_num_chunks,
             chunk_layout=settings.fainder_chunk_layout,
+            cache_size=settings.fainder_cache_size,
         )
 
         hnsw_index = HnswIndex(
@@ -36,6 +36,7 @@ IntegerArray = Annotated[
 ]
 DocumentArray = NDArray[np.uint32]
 ColumnArray = NDArray[np.uint32]
+ScoreArray = NDArray[np.float64]
 
 
 class ExecutorType(StrEnum):
@@ -64,11 +65,24 @@ class Metadata(BaseModel):
     doc_to_path: list[str]
     col_to_doc: IntegerArray
     name_to_vector: dict[str, int]
-    vector_to_cols: dict[int, set[int]]
+    vector_to_cols: list[IntegerArray]
     num_hists: int
 
     model_config = ConfigDict(arbitrary_types_allowed=True)
 
+    @field_validator("vector_to_cols", mode="before")
+    @classmethod
+    def vector_to_cols_from_dict(
+        cls, value: list[list[int]] | dict[str, list[int]]
+    ) -> list[list[int]]:
+        """Accept the previous format that mapped stringified vector IDs to lists of columns."""
+        if not isinstance(value, dict):
+            return value
+        vector_to_cols: list[list[int]] = [[] for _ in range(max(map(int, value), default=-1) + 1)]
+        for vector_id, col_ids in value.items():
+            vector_to_cols[int(vector_id)] = sorted(col_ids)
+        return vector_to_cols
+
 
 class FainderConfig(BaseModel):
     n_clusters: int
@@ -115,12 +129,13 @@ class Settings(BaseSettings):
     fainder_chunk_layout: FainderChunkLayout = FainderChunkLayout.CONTIGUOUS
     fainder_num_workers: int = (os.cpu_count() or 1) - 1
     fainder_num_chunks: int = (os.cpu_count() or 1) - 1
+    fainder_cache_size: int = 128
 
     # Embedding/HNSW settings
     use_embeddings: bool = True
     embedding_model: str = "all-MiniLM-L6-v2"
     embedding_batch_size: int = 32
-    hnsw_ef_construction: int = 400
+    hnsw_ef_construction: int = 128
     hnsw_n_bidirectional_links: int = 64
     hnsw_ef: int = 50
 
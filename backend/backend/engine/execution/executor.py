@@ -1,10 +1,9 @@
 from abc import ABC, abstractmethod
-from collections.abc import Sequence
 
 from lark import ParseTree
 from loguru import logger
 
-from backend.config import DocumentArray, FainderMode, Metadata
+from backend.config import DocumentArray, FainderMode, Metadata, ScoreArray
 from backend.indices import FainderIndex, HnswIndex, TantivyIndex
 
 from .common import DocResult
@@ -40,8 +39,9 @@ class Executor(ABC):
     def execute(self, tree: ParseTree) -> DocResult:
         """Start processing the parse tree."""
 
-    def updates_scores(self, doc_ids: DocumentArray, scores: Sequence[float]) -> None:
+    def updates_scores(self, doc_ids: DocumentArray, scores: ScoreArray) -> None:
         logger.trace("Updating scores for {} documents", doc_ids.size)
 
-        for doc_id, score in zip(doc_ids, scores, strict=True):
-            self.scores[int(doc_id)] += score
+        # Convert both arrays to Python scalars at once instead of boxing each element
+        for doc_id, score in zip(doc_ids.tolist(), scores.tolist(), strict=True):
+            self.scores[doc_id] += score
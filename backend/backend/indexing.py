@@ -1,50 +1,189 @@
 import argparse
+import hashlib
 import os
+import pickle  # noqa: S403
 import sys
-from collections import defaultdict
-from collections.abc import Sequence
+import tempfile
+from collections import deque
+from collections.abc import Iterator, Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import accumulate, chain, pairwise
 from pathlib import Path
-from typing import TYPE_CHECKING, Any, Literal
+from typing import Any, Literal
 
 import hnswlib
 import numpy as np
-import tantivy
+import orjson
+import torch
+import zstandard
 from fainder.execution.parallel_processing import FainderChunkLayout, partition_histogram_ids
 from fainder.preprocessing.clustering import cluster_histograms
 from fainder.preprocessing.percentile_index import create_index
 from fainder.typing import Histogram
 from fainder.utils import configure_run, save_output
 from loguru import logger
+from numpy.typing import NDArray
 from pydantic import DirectoryPath
 from sentence_transformers import SentenceTransformer
 
 from backend.config import Settings
-from backend.indices import TantivyIndex, get_tantivy_schema
+from backend.indices import TantivyIndex
+from backend.indices.name_op import INDEX_MANIFEST_FILE, canonicalize_name
 from backend.utils import dump_json, load_json
 
-if TYPE_CHECKING:
-    from numpy.typing import NDArray
+# Document fields that are part of the Tantivy schema (see get_tantivy_schema)
+TANTIVY_FIELDS = (
+    "id",
+    "name",
+    "description",
+    "keywords",
+    "creator",
+    "publisher",
+    "alternateName",
+    "usability",
+)
+# Minimum number of column names for which we compile the embedding model
+MIN_STRINGS_FOR_COMPILE = 2_000
+# Number of documents per worker that are read ahead or waiting to be written back during
+# ingestion, which bounds the number of parsed documents in memory
+DOCS_IN_FLIGHT_PER_WORKER = 2
+
+
+def _prepare_document_for_tantivy(json_doc: dict[str, Any]) -> dict[str, Any]:
+    """Extract and flatten the fields of a document that are ingested by Tantivy."""
+    tantivy_doc = {field: json_doc[field] for field in TANTIVY_FIELDS if field in json_doc}
+
+    # Fields that are already flattened (e.g., strings) are left untouched
+    if isinstance(tantivy_doc.get("keywords"), list):
+        keywords: list[Any] = tantivy_doc["keywords"]
+        tantivy_doc["keywords"] = "; ".join(str(keyword) for keyword in keywords)
+
+    for field in ("creator", "publisher"):
+        if isinstance(tantivy_doc.get(field), dict):
+            entity: dict[str, Any] = tantivy_doc[field]
+            tantivy_doc[field] = entity.get("name", "")
+
+    return tantivy_doc
+
+
+def _to_array_views(
+    values: list[list[float]], buffer: NDArray[np.floating[Any]]
+) -> list[NDArray[np.floating[Any]]]:
+    """Copy a list of lists to the front of a contiguous buffer and return views of the copies.
+
+    This is considerably faster than converting each list to a separate array. A single
+    np.fromiter with a known count over all values was also measured to be faster than
+    assigning each list to its slice of the buffer.
+    """
+    lengths = [len(value) for value in values]
+    offsets = list(accumulate(lengths, initial=0))
+    buffer[: offsets[-1]] = np.fromiter(
+        chain.from_iterable(values), dtype=buffer.dtype, count=offsets[-1]
+    )
+    return [buffer[start:end] for start, end in pairwise(offsets)]
 
 
-def _prepare_document_for_tantivy(json_doc: dict[str, Any]) -> None:
-    """Modify the document to be ingested by Tantivy."""
-    if "keywords" in json_doc:
-        keywords: list[Any] = json_doc["keywords"]
-        json_doc["keywords"] = "; ".join(str(keyword) for keyword in keywords)
+def _allocate_hist_buffer(
+    size: int, dtype: type[np.floating[Any]], on_disk: bool
+) -> NDArray[np.floating[Any]]:
+    """Allocate a flat buffer for histogram values, optionally backed by a temporary file.
+
+    A file-backed buffer lets the OS page the histogram values out of memory, so that they do
+    not add to the memory footprint of ingestion and of building the Fainder indices.
+    """
+    if not on_disk or size == 0:
+        return np.empty(size, dtype=dtype)
+    # NOTE: The mapping stays valid after the temporary file is closed and removed. We return a
+    # plain ndarray view so that pickled histograms do not contain memmap objects.
+    with tempfile.TemporaryFile() as file:
+        return np.asarray(np.memmap(file, dtype=dtype, mode="w+", shape=(size,)))
+
+
+def _has_histogram(col: dict[str, Any]) -> bool:
+    """Return whether a column has a histogram, treating a null histogram as missing."""
+    return col.get("histogram") is not None
+
+
+def _assign_column_ids(has_hist: NDArray[np.bool_]) -> NDArray[np.uint32]:
+    """Assign unique IDs to columns in the order in which they are ingested.
+
+    Columns with a histogram receive the IDs 0 to num_hists - 1 so that the histogram IDs
+    coincide with their column IDs. All other columns receive the subsequent IDs.
+    """
+    num_hists = np.count_nonzero(has_hist)
+    hist_ids = np.cumsum(has_hist) - 1
+    no_hist_ids = np.cumsum(~has_hist) + (num_hists - 1)
+    return np.where(has_hist, hist_ids, no_hist_ids).astype(np.uint32)
+
+
+def _count_columns(path: Path) -> tuple[list[bool], int, int]:
+    """Parse a Croissant file and return which of its columns have a histogram.
+
+    Also return the total number of densities and bins of the histograms. The parsed document
+    is released afterward, so only these counts are kept per document.
+    """
+    json_doc = load_json(path)
+    has_hist: list[bool] = []
+    num_densities = 0
+    num_bins = 0
+    for record_set in json_doc.get("recordSet", []):
+        for col in record_set.get("field", []):
+            has_hist.append(_has_histogram(col))
+            if has_hist[-1]:
+                histogram = col["histogram"]
+                num_densities += len(histogram.get("densities", ()))
+                num_bins += len(histogram.get("bins", ()))
+    return has_hist, num_densities, num_bins
+
+
+def _load_json_ahead(
+    executor: ThreadPoolExecutor, paths: Sequence[Path], window: int
+) -> Iterator[dict[str, Any]]:
+    """Load JSON files in order while reading at most `window` files ahead."""
+    pending: deque[Future[dict[str, Any]]] = deque()
+    for path in paths:
+        pending.append(executor.submit(load_json, path))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _list_croissant_files(croissant_path: Path) -> list[str]:
+    """List the names of the Croissant files of a collection in sorted order.
+
+    Sorting the names keeps the assigned document IDs deterministic across runs. The directory
+    entries of os.scandir already know their type, so this does not stat each file.
+    """
+    with os.scandir(croissant_path) as entries:
+        names = [entry.name for entry in entries if entry.is_file()]
+    names.sort()
+    return names
 
-    if (
-        "creator" in json_doc
-        and isinstance(json_doc["creator"], dict)
-        and "name" in json_doc["creator"]
-    ):
-        json_doc["creator"] = json_doc["creator"]["name"]
 
+def _hash_names(names: Sequence[str]) -> str:
+    """Return a digest of the column names that identifies them and their order."""
+    return hashlib.sha256(orjson.dumps(names)).hexdigest()
+
+
+def _reusable_index_size(manifest_path: Path, manifest: dict[str, Any], names: list[str]) -> int:
+    """Return the number of vectors of an existing HNSW index that can be reused.
+
+    An index can be extended if it was built with the same parameters and its names are a
+    prefix of the current names, because the vector IDs are the positions of the names.
+    """
+    if not manifest_path.exists():
+        return 0
+    previous = load_json(manifest_path)
+    num_names: int = previous.pop("num_names", 0)
+    names_hash: str | None = previous.pop("names_hash", None)
     if (
-        "publisher" in json_doc
-        and isinstance(json_doc["publisher"], dict)
-        and "name" in json_doc["publisher"]
+        previous != manifest
+        or num_names > len(names)
+        or names_hash != _hash_names(names[:num_names])
     ):
-        json_doc["publisher"] = json_doc["publisher"]["name"]
+        return 0
+    return num_names
 
 
 def generate_metadata(
@@ -52,6 +191,8 @@ def generate_metadata(
     metadata_path: DirectoryPath,
     tantivy_path: DirectoryPath,
     return_documents: bool = True,
+    workers: int | None = os.cpu_count(),
+    hists_on_disk: bool = False,
 ) -> tuple[
     list[tuple[np.uint32, Histogram]], dict[str, int], dict[int, dict[str, Any]], TantivyIndex
 ]:
@@ -59,86 +200,157 @@ def generate_metadata(
 
     While loading the files, assign unique IDs to documents, columns, histograms, and vectors.
     This function also creates and stores mappings between entities that are needed for
-    downstream processing.
+    downstream processing. Vector IDs are assigned consecutively in the insertion order of
+    `name_to_vector`, which downstream consumers rely on. Reading and writing the files is
+    spread over a thread pool with `workers` threads, so file I/O overlaps with parsing.
+
+    The histograms are stored as views into two flat buffers for densities and bins. With
+    `hists_on_disk`, these buffers are memory-mapped temporary files instead of in-memory arrays.
     """
     # Initialize mappings
     # NOTE: We need the vector_id intermediate step because hnswlib requires int IDs for vectors
-    doc_to_cols: list[list[int]] = []
-    doc_to_path: list[str] = []
     name_to_vector: dict[str, int] = {}
-    vector_to_cols: dict[int, set[int]] = defaultdict(set)
 
     json_docs: dict[int, dict[str, Any]] = {}
-    tantivy_docs: list[tantivy.Document] = []
-    tantivy_schema = get_tantivy_schema()
-
-    # First pass: count the number of histograms
-    logger.info("Counting histograms")
-    num_hists = 0
-    num_cols = 0
-    for path in croissant_path.iterdir():
-        json_doc = load_json(path)
-        doc_to_cols.append([])
-        for record_set in json_doc.get("recordSet", []):
-            fields = record_set.get("field", [])
-            num_hists += sum(1 for col in fields if "histogram" in col)
-            num_cols += len(fields)
+
+    # Read all files once and count the number of histograms
+    logger.info("Counting columns and histograms")
+    # Store the document paths for file-based Croissant stores
+    doc_to_path = _list_croissant_files(croissant_path)
+    paths = [croissant_path / name for name in doc_to_path]
+    # NOTE: The column IDs depend on the number of histograms in the whole collection, so we
+    # need a counting pass before ingestion. It only keeps the counts of each document and the
+    # ingestion reads the files again, which costs a second parse but keeps only a bounded
+    # number of parsed documents in memory.
+    # NOTE: A process pool does not pay off for loading because unpickling the parsed documents
+    # in the parent process costs about as much as parsing them with orjson
+    has_hist: list[bool] = []
+    doc_col_offsets = [0]
+    num_densities = 0
+    num_bins = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for doc_has_hist, doc_num_densities, doc_num_bins in executor.map(_count_columns, paths):
+            has_hist.extend(doc_has_hist)
+            doc_col_offsets.append(len(has_hist))
+            num_densities += doc_num_densities
+            num_bins += doc_num_bins
+
+    # Assign all column IDs at once instead of maintaining counters in the ingestion loop
+    col_ids = _assign_column_ids(np.array(has_hist, dtype=np.bool_))
+    num_hists = sum(has_hist)
+    num_cols = len(has_hist)
+    del has_hist
 
     logger.info("Found {} histograms and {} columns", num_hists, num_cols)
 
-    # We need to pre-allocate the column ID mapping since we insert at different indices
-    col_to_doc: list[int] = [-1] * num_cols
+    # The columns of each document are a contiguous slice of the column IDs, so we can derive
+    # the mappings between documents and columns without touching the individual columns
+    doc_to_cols = [col_ids[start:end] for start, end in pairwise(doc_col_offsets)]
+    col_to_doc = np.empty(num_cols, dtype=np.uint32)
+    col_to_doc[col_ids] = np.repeat(
+        np.arange(len(doc_to_cols), dtype=np.uint32), np.diff(doc_col_offsets)
+    )
+    # NOTE: Instead of one list per vector, we store the vector of each column in a flat array
+    # and group the columns by vector in a single CSR-style pass after ingestion
+    # NOTE: Columns that are skipped because their document is malformed keep the sentinel
+    # vector and are left out of vector_to_cols
+    no_vector = np.iinfo(np.uint32).max
+    col_to_vector = np.full(num_cols, no_vector, dtype=np.uint32)
+
+    # Stream the documents into Tantivy during ingestion with a single writer and commit, so
+    # that Tantivy's indexing threads overlap with processing the documents
+    logger.info("Initializing Tantivy index")
+    tantivy_index = TantivyIndex(tantivy_path, recreate=True)
+    tantivy_writer = tantivy_index.writer(num_threads=workers or 0)
 
-    # Second pass: process the documents with the updated column IDs
+    # Process the loaded documents with the updated column IDs
     logger.info("Processing documents")
+    # NOTE: Histograms have a varying number of bins and Fainder's clustering and index
+    # construction consume (id, (densities, bins)) tuples, so we cannot collect them in
+    # contiguous (n_hists, n_bins) matrices here
     hists: list[tuple[np.uint32, Histogram]] = []
-    vector_id = 0
-    col_id_hist = 0
-    col_id_no_hist = num_hists
-
-    for doc_id, path in enumerate(sorted(croissant_path.iterdir())):
-        # Read the file and add a document ID to it
-        json_doc = load_json(path)
-        json_doc["id"] = doc_id
-        if return_documents:
-            json_docs[doc_id] = json_doc
-
-        # Ingest histograms and assign unique ids to columns
-        try:
-            for record_set in json_doc["recordSet"]:
-                for col in record_set["field"]:
-                    if "histogram" in col:
-                        col_id = col_id_hist
-                        densities = np.array(col["histogram"]["densities"], dtype=np.float32)
-                        bins = np.array(col["histogram"]["bins"], dtype=np.float64)
-                        hists.append((np.uint32(col_id_hist), (densities, bins)))
-                        col["histogram"]["id"] = col_id_hist
-                        col_id_hist += 1
-                    else:
-                        col_id = col_id_no_hist
-                        col_id_no_hist += 1
-
+    # NOTE: Bin edges must stay float64 because float32 cannot exactly represent large
+    # values (e.g., IDs or timestamps), which would change the results of exact queries
+    densities_buffer = _allocate_hist_buffer(num_densities, np.float32, hists_on_disk)
+    bins_buffer = _allocate_hist_buffer(num_bins, np.float64, hists_on_disk)
+    densities_offset = 0
+    bins_offset = 0
+
+    docs_in_flight = DOCS_IN_FLIGHT_PER_WORKER * (workers or 1)
+    write_futures: deque[Future[None]] = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        loaded_docs = _load_json_ahead(executor, paths, docs_in_flight)
+        for doc_id, (path, json_doc) in enumerate(zip(paths, loaded_docs, strict=True)):
+            # Track whether the document already contains all assigned IDs from a previous run
+            unchanged = json_doc.get("id") == doc_id
+            json_doc["id"] = doc_id
+            if return_documents:
+                json_docs[doc_id] = json_doc
+
+            # Ingest histograms and assign unique ids to columns
+            doc_hist_ids: list[int] = []
+            doc_densities: list[list[float]] = []
+            doc_bins: list[list[float]] = []
+            doc_col_ids: list[int] = doc_to_cols[doc_id].tolist()
+            try:
+                cols = chain.from_iterable(
+                    record_set["field"] for record_set in json_doc["recordSet"]
+                )
+                for col, col_id in zip(cols, doc_col_ids, strict=True):
+                    if _has_histogram(col):
+                        histogram = col["histogram"]
+                        # Read both arrays before appending so that a malformed histogram does
+                        # not leave the per-document lists with different lengths
+                        densities, bins = histogram["densities"], histogram["bins"]
+                        doc_hist_ids.append(col_id)
+                        doc_densities.append(densities)
+                        doc_bins.append(bins)
+                        unchanged = unchanged and histogram.get("id") == col_id
+                        histogram["id"] = col_id
+
+                    unchanged = unchanged and col.get("id") == col_id
                     col["id"] = col_id
-                    doc_to_cols[doc_id].append(col_id)
-                    col_to_doc[col_id] = doc_id
 
-                    col_name = col["name"]
-                    if col_name not in name_to_vector:
-                        name_to_vector[col_name] = vector_id
-                        vector_id += 1
-                    vector_to_cols[name_to_vector[col_name]].add(col_id)
-        except KeyError as e:
-            logger.error("KeyError {} reading file {}", e, path)
+                    # NOTE: Keying this lookup by a precomputed 64-bit hash of the name (e.g.,
+                    # xxh3) was not faster because each name is hashed once per lookup anyway
+                    col_to_vector[col_id] = name_to_vector.setdefault(
+                        col["name"], len(name_to_vector)
+                    )
+            except KeyError as e:
+                logger.error("KeyError {} reading file {}", e, path)
+
+            # Copy all histograms of the document into the flat buffers at once
+            hists.extend(
+                (np.uint32(hist_id), (densities, bins))
+                for hist_id, densities, bins in zip(
+                    doc_hist_ids,
+                    _to_array_views(doc_densities, densities_buffer[densities_offset:]),
+                    _to_array_views(doc_bins, bins_buffer[bins_offset:]),
+                    strict=True,
+                )
+            )
+            densities_offset += sum(map(len, doc_densities))
+            bins_offset += sum(map(len, doc_bins))
+
+            # Only index the flattened fields that are needed for keyword search
+            # NOTE: Serializing the fields with orjson and letting Tantivy parse the JSON was
+            # about 4x cheaper on the Python side than Document.from_dict
+            tantivy_writer.add_json(orjson.dumps(_prepare_document_for_tantivy(json_doc)).decode())
 
-        # Store the document path for file-based Croissant stores
-        doc_to_path.append(path.name)
+            # Replace the original file with the extended document unless it is up to date
+            if not unchanged:
+                write_futures.append(executor.submit(dump_json, json_doc, path))
+            # Wait for the oldest writes so that documents do not pile up in the write queue
+            # NOTE: This also propagates errors from writing the documents
+            while len(write_futures) > docs_in_flight:
+                write_futures.popleft().result()
 
-        # Replace the original file with the extended document
-        dump_json(json_doc, path)
+        for future in write_futures:
+            future.result()
+    del write_futures
 
-        # Prepare document for Tantivy indexing
-        _prepare_document_for_tantivy(json_doc)
-        tantivy_docs.append(tantivy.Document.from_dict(json_doc, tantivy_schema))  # pyright: ignore[reportUnknownMemberType]
+    tantivy_writer.commit()
+    tantivy_writer.wait_merging_threads()
 
     logger.info(
         "Found {} documents with {} columns and {} histograms.",
@@ -147,12 +359,20 @@ def generate_metadata(
         num_hists,
     )
 
-    # Index the documents in Tantivy (we index all documents at once to increase performance)
-    logger.info("Initializing Tantivy index")
-    tantivy_index = TantivyIndex(tantivy_path, recreate=True)
-    tantivy_index.add_documents(tantivy_docs)
+    # Group the column IDs by vector: sorting the columns by their vector yields the flat column
+    # array and the vector counts yield the offsets into it
+    named_col_ids = np.flatnonzero(col_to_vector != no_vector).astype(np.uint32)
+    named_col_vectors = col_to_vector[named_col_ids]
+    sorted_col_ids = named_col_ids[np.argsort(named_col_vectors, kind="stable")]
+    offsets = np.cumsum(np.bincount(named_col_vectors, minlength=len(name_to_vector)))
+    # NOTE: np.split always returns at least one array, so we special-case empty collections to
+    # keep one entry per vector
+    vector_to_cols = np.split(sorted_col_ids, offsets[:-1]) if name_to_vector else []
+    del col_to_vector, named_col_ids, named_col_vectors
 
     # Save the mappings and indices
+    # NOTE: dump_json serializes the numpy mappings natively with orjson. We do not compress the
+    # file because the metadata is loaded with Metadata.model_validate_json.
     logger.info("Saving metadata")
     dump_json(
         {
@@ -161,7 +381,7 @@ def generate_metadata(
             "col_to_doc": col_to_doc,
             "num_hists": num_hists,
             "name_to_vector": name_to_vector,
-            "vector_to_cols": {str(k): list(v) for k, v in vector_to_cols.items()},
+            "vector_to_cols": vector_to_cols,
         },
         metadata_path,
     )
@@ -197,21 +417,30 @@ def generate_fainder_indices(
         verbose=False,
     )
 
-    logger.info("Creating rebinning index")
-    rebinning_index, _, _ = create_index(
-        clustered_hists=clustered_hists,
-        cluster_bins=cluster_bins,
-        index_method="rebinning",
-        workers=workers,
-    )
-
-    logger.info("Creating conversion index")
-    conversion_index, _, _ = create_index(
-        clustered_hists=clustered_hists,
-        cluster_bins=cluster_bins,
-        index_method="conversion",
-        workers=workers,
-    )
+    # Both indices only depend on the clustering, so we build them concurrently and split the
+    # available workers between them to avoid oversubscription
+    # NOTE: A fused builder that computes both indices in one traversal would have to live in
+    # the fainder package; running both builds at the same time at least shares the clustered
+    # histograms while they are hot in memory
+    logger.info("Creating rebinning and conversion indices")
+    index_workers = max(1, workers // 2) if workers is not None else None
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        rebinning_future = executor.submit(
+            create_index,
+            clustered_hists=clustered_hists,
+            cluster_bins=cluster_bins,
+            index_method="rebinning",
+            workers=index_workers,
+        )
+        conversion_future = executor.submit(
+            create_index,
+            clustered_hists=clustered_hists,
+            cluster_bins=cluster_bins,
+            index_method="conversion",
+            workers=index_workers,
+        )
+        rebinning_index, _, _ = rebinning_future.result()
+        conversion_index, _, _ = conversion_future.result()
 
     # Save indices with config name in the filename
     rebinning_file = f"{config_name}_rebinning.zst"
@@ -258,7 +487,7 @@ def generate_fainder_indices(
             name="conversion index",
         )
 
-    save_output(output_path / "histograms.zst", hists, name="histograms")
+    save_histograms(output_path / "histograms.zst", hists)
 
 
 def generate_embedding_index(
@@ -269,44 +498,144 @@ def generate_embedding_index(
     show_progress_bar: bool = True,
     precision: Literal["float32", "int8", "uint8", "binary", "ubinary"] = "float32",
     normalize_embeddings: bool = True,
-    ef_construction: int = 400,
+    ef_construction: int = 128,
     n_bidirectional_links: int = 64,
     seed: int = 42,
+    canonicalize_names: bool = True,
+    num_threads: int = os.cpu_count() or 1,
+    quantize_on_cpu: bool = True,
+    incremental: bool = True,
 ) -> None:
-    strings = list(name_to_vector.keys())
-    ids = np.array(list(name_to_vector.values()), dtype=np.uint64)
+    """Encode the column names and build an HNSW index over their embeddings.
+
+    With `canonicalize_names`, names that only differ in case or whitespace are encoded once and
+    share their embedding. The embeddings are expanded to all vector IDs with an inverse index.
+
+    With `incremental`, an existing index that was built with the same parameters is extended
+    with the names that were appended since it was built instead of being rebuilt.
+    """
+    index_path = output_path / "index.bin"
+    manifest_path = output_path / INDEX_MANIFEST_FILE
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    # NOTE: The manifest records how the model is actually run because half precision and int8
+    # quantization change the embeddings, so an index must not be extended across them
+    manifest: dict[str, Any] = {
+        "model_name": model_name,
+        "precision": precision,
+        "normalize_embeddings": normalize_embeddings,
+        "ef_construction": ef_construction,
+        "n_bidirectional_links": n_bidirectional_links,
+        "seed": seed,
+        "canonicalize_names": canonicalize_names,
+        "device": device,
+        "dtype": "float16" if device == "cuda" else "float32",
+        "quantization": "int8" if device == "cpu" and quantize_on_cpu else None,
+    }
+    names = list(name_to_vector)
+    num_existing = 0
+    if incremental and index_path.exists():
+        num_existing = _reusable_index_size(manifest_path, manifest, names)
+    if num_existing > 0 and num_existing == len(names):
+        logger.info("HNSW index with {} vectors is up to date", num_existing)
+        return
+
+    # NOTE: generate_metadata assigns vector IDs consecutively in insertion order, so the ID of
+    # each name is its position in the mapping
+    strings = names[num_existing:]
+    ids = np.arange(num_existing, len(names), dtype=np.uint64)
+
+    # Only encode each distinct string once. Canonicalizing case and whitespace does not change
+    # the embeddings of uncased models such as the default MiniLM model.
+    # NOTE: HnswIndex reads the choice from the manifest and canonicalizes queries the same way
+    if canonicalize_names:
+        strings = [canonicalize_name(string) for string in strings]
+    string_to_idx: dict[str, int] = {}
+    inverse = np.fromiter(
+        (string_to_idx.setdefault(string, len(string_to_idx)) for string in strings),
+        dtype=np.int64,
+        count=len(strings),
+    )
+    unique_strings = list(string_to_idx)
+    logger.info("Encoding {} distinct strings for {} column names", len(unique_strings), len(ids))
 
     logger.info("Generating embeddings")
     embedder = SentenceTransformer(
         model_name_or_path=model_name,
+        device=device,
         cache_folder=(output_path / "model_cache").as_posix(),
         # Possibly use ONNX, see: https://github.com/lbhm/fainder-demo/issues/102
         # backend="onnx",
         # model_kwargs={"file_name": "onnx/model_O2.onnx"},
     )
-    # Maybe remove the module compilation if it does not help with performance
-    embedder.compile()  # type: ignore[no-untyped-call]
-    embeddings: NDArray[np.float32] = embedder.encode(  # pyright: ignore[reportUnknownMemberType, reportUnknownVariableType]
-        sentences=strings,
+    if device == "cuda":
+        # Half precision roughly doubles the encoding throughput on GPUs
+        embedder.half()
+        # The compilation warmup only pays off when encoding enough strings
+        if len(unique_strings) >= MIN_STRINGS_FOR_COMPILE:
+            # Persist the compiled kernels so that subsequent runs can reuse them
+            os.environ.setdefault(
+                "TORCHINDUCTOR_CACHE_DIR", (output_path / "inductor_cache").as_posix()
+            )
+            embedder.compile()  # type: ignore[no-untyped-call]
+    elif quantize_on_cpu:
+        # Dynamic int8 quantization of the linear layers speeds up encoding on CPUs, especially
+        # on those with int8 dot product instructions (e.g., AVX-512 VNNI)
+        # NOTE: We use torch's built-in quantization instead of an int8 ONNX export because the
+        # ONNX backend would require optimum and onnxruntime as additional dependencies
+        torch.ao.quantization.quantize_dynamic(
+            embedder, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+        )
+    # NOTE: SentenceTransformer.encode already sorts all sentences by length before batching
+    # (and restores the input order), so batches contain names of similar length
+    unique_embeddings: NDArray[np.float32] = embedder.encode(  # pyright: ignore[reportUnknownMemberType, reportUnknownVariableType]
+        sentences=unique_strings,
         batch_size=batch_size,
         show_progress_bar=show_progress_bar,
         convert_to_numpy=True,
         precision=precision,
         normalize_embeddings=normalize_embeddings,
     )
+    embeddings = unique_embeddings[inverse].astype(np.float32, copy=False)
 
     logger.info("Creating HNSW index")
+    # NOTE: We do not quantize the embeddings (e.g., to int8 or binary) because hnswlib only
+    # supports float32 spaces, so quantized vectors would neither shrink the index nor speed up
+    # its distance computations. Quantized indices (e.g., in usearch or faiss) would require a
+    # different index library and rescoring in HnswIndex.
     index = hnswlib.Index(space="cosine", dim=embeddings.shape[1])
-    index.init_index(
-        max_elements=embeddings.shape[0],
-        ef_construction=ef_construction,
-        M=n_bidirectional_links,
-        random_seed=seed,
-    )
-    index.add_items(embeddings, ids)
+    if num_existing > 0:
+        logger.info("Extending HNSW index with {} vectors to {}", len(ids), len(names))
+        index.load_index(index_path.as_posix(), max_elements=len(names))
+    else:
+        index.init_index(
+            max_elements=len(names),
+            ef_construction=ef_construction,
+            M=n_bidirectional_links,
+            random_seed=seed,
+        )
+    index.set_num_threads(num_threads)
+    index.add_items(embeddings, ids, num_threads=num_threads)
 
     logger.info("Saving HNSW index")
-    index.save_index((output_path / "index.bin").as_posix())
+    index.save_index(index_path.as_posix())
+    dump_json(
+        {**manifest, "num_names": len(names), "names_hash": _hash_names(names)}, manifest_path
+    )
+
+
+def save_histograms(
+    path: Path, hists: Sequence[tuple[int | np.integer[Any], Histogram]], level: int = 3
+) -> None:
+    """Save histograms in the zstd-compressed pickle format that Fainder's load_input reads.
+
+    In contrast to save_output, the pickle stream is compressed with multiple threads while it
+    is written, so we never materialize the full serialized histograms in memory.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    compressor = zstandard.ZstdCompressor(level=level, threads=-1)
+    with path.open("wb") as file, compressor.stream_writer(file) as writer:
+        pickle.dump(hists, writer, protocol=pickle.HIGHEST_PROTOCOL)
+    logger.debug("Saved {} histograms to {}", len(hists), path)
 
 
 def save_histograms_parallel(
@@ -314,13 +643,18 @@ def save_histograms_parallel(
     output_path: Path,
     n_chunks: int,
     chunk_layout: FainderChunkLayout = FainderChunkLayout.ROUND_ROBIN,
+    workers: int | None = os.cpu_count(),
 ) -> None:
-    """Save histograms in parallel chunks for Fainder."""
+    """Save histograms in parallel chunks for Fainder.
+
+    The chunks are written by up to `workers` threads at the same time.
+    """
     logger.info("Partitioning histogram IDs for parallel processing with {} chunks", n_chunks)
     if n_chunks <= 0:
         raise ValueError("Number of chunks must be greater than 0")
+    hist_ids = np.fromiter((id_ for id_, _ in hists), dtype=np.int64, count=len(hists))
     hist_id_chunks = partition_histogram_ids(
-        [int(id_) for id_, _ in hists], num_partitions=n_chunks, chunk_layout=chunk_layout
+        hist_ids.tolist(), num_partitions=n_chunks, chunk_layout=chunk_layout
     )
     logger.info(
         "Partitioned histogram IDs into {} chunks of length {}",
@@ -337,20 +671,43 @@ def save_histograms_parallel(
     split_dir.mkdir(exist_ok=True, parents=True)
     logger.info(f"Created directory for split histograms: {split_dir}")
 
-    for i in range(n_chunks):
-        logger.info("Saving histograms for chunk {}", i)
-        # split up the histograms into chunks for each worker
-        chunk_hists = [(id_, hist) for id_, hist in hists if id_ in hist_id_chunks[i]]
+    # Split up the histograms into chunks for each worker with a vectorized chunk lookup table
+    # indexed by histogram ID (-1 marks IDs that do not belong to any chunk)
+    id_to_chunk = np.full(int(hist_ids.max(initial=-1)) + 1, -1, dtype=np.int64)
+    for chunk_id, chunk in enumerate(hist_id_chunks):
+        id_to_chunk[np.asarray(chunk, dtype=np.int64)] = chunk_id
+    hist_chunks = id_to_chunk[hist_ids]
+    chunks = [
+        [hists[pos] for pos in np.flatnonzero(hist_chunks == chunk_id).tolist()]
+        for chunk_id in range(n_chunks)
+    ]
+
+    def save_chunk(i: int) -> None:
+        chunk_hists = chunks[i]
         logger.info("Chunk {} will process {} histograms", i, len(chunk_hists))
-        save_output(
-            split_dir / f"histograms_{i}.zst",
-            chunk_hists,
-            name="histograms",
-        )
+        save_histograms(split_dir / f"histograms_{i}.zst", chunk_hists)
         logger.info(
             "Saved {} histograms to file: {}", len(chunk_hists), split_dir / f"histograms_{i}.zst"
         )
 
+    # Compress and write the chunks concurrently since zstd releases the GIL
+    with ThreadPoolExecutor(max_workers=min(n_chunks, workers or 1)) as executor:
+        # Consume the results to propagate errors from the worker threads
+        list(executor.map(save_chunk, range(n_chunks)))
+
+
+def warn_if_default_allocator() -> None:
+    """Warn if neither mimalloc nor jemalloc is preloaded into the current process."""
+    maps = Path("/proc/self/maps")
+    if not maps.exists():
+        return
+    libraries = maps.read_text()
+    if "mimalloc" not in libraries and "jemalloc" not in libraries:
+        logger.warning(
+            "Using the default memory allocator. Set LD_PRELOAD=libmimalloc.so (or jemalloc) "
+            "to reduce the memory footprint and speed up indexing."
+        )
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
@@ -417,11 +774,14 @@ if __name__ == "__main__":
         logger.error("Error loading settings: {}", e)
         sys.exit(1)
 
+    warn_if_default_allocator()
+
     hists, name_to_vector, _, _ = generate_metadata(  # type: ignore[assignment]
         settings.croissant_path,
         settings.metadata_path,
         settings.tantivy_path,
         return_documents=False,
+        hists_on_disk=True,
     )
 
     if not args.no_fainder:
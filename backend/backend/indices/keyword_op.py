@@ -1,23 +1,34 @@
 import shutil
 import time
 from collections import defaultdict
+from functools import lru_cache
 from pathlib import Path
 
 import numpy as np
 import tantivy
 from loguru import logger
 
-from backend.config import DocumentArray, DocumentHighlights
+from backend.config import DocumentArray, DocumentHighlights, ScoreArray
 
 MAX_DOCS = 1000000
-DOC_FIELDS: list[str] = [
+# Total memory budget of the index writer, a larger budget means fewer intermediate segments
+WRITER_HEAP_SIZE = 512 * 1024 * 1024
+# Tantivy rejects writers with less than 15 MB of heap per thread and gains little from more
+# than 8 indexing threads
+MIN_WRITER_HEAP_PER_THREAD = 15_000_000
+MAX_WRITER_THREADS = 8
+DOC_FIELDS: tuple[str, ...] = (
     "name",
     "description",
     "keywords",
     "creator",
     "publisher",
     "alternateName",
-]
+)
+# Names of the document fields in the highlights that are returned to the frontend
+HIGHLIGHT_FIELD_NAMES: dict[str, str] = {
+    field: f"{field}-name" if field in {"creator", "publisher"} else field for field in DOC_FIELDS
+}
 
 
 def get_tantivy_schema() -> tantivy.Schema:
@@ -42,6 +53,9 @@ class TantivyIndex:
         self.index_path = str(index_path)
         self.schema = get_tantivy_schema()
         self.index = self.load_index(self.schema, recreate)
+        # NOTE: Don't use lru_cache on methods
+        # See https://docs.astral.sh/ruff/rules/cached-instance-method/ for details
+        self._parse_query = lru_cache(maxsize=1024)(self._parse_query_uncached)
 
     def load_index(self, schema: tantivy.Schema, recreate: bool = False) -> tantivy.Index:
         """Load the index from the index path. If the index does not exist, create a new index."""
@@ -53,12 +67,21 @@ class TantivyIndex:
 
         return tantivy.Index(schema=schema, path=self.index_path, reuse=not recreate)
 
-    def add_documents(self, docs: list[tantivy.Document]) -> None:
-        writer = self.index.writer()
-        for doc in docs:
-            writer.add_document(doc)
-        writer.commit()
-        writer.wait_merging_threads()
+    def writer(
+        self, heap_size: int = WRITER_HEAP_SIZE, num_threads: int = 0
+    ) -> "tantivy.IndexWriter":
+        """Create a writer for the index.
+
+        The writer splits `heap_size` bytes between up to `num_threads` indexing threads, which
+        build segments in parallel while documents are added from the calling thread. The number
+        of threads is capped so that each thread gets the minimum heap that Tantivy requires. If
+        `num_threads` is 0, Tantivy chooses the number of threads itself.
+        """
+        if num_threads > 0:
+            num_threads = max(
+                1, min(num_threads, MAX_WRITER_THREADS, heap_size // MIN_WRITER_HEAP_PER_THREAD)
+            )
+        return self.index.writer(heap_size=heap_size, num_threads=num_threads)
 
     def search(
         self,
@@ -66,20 +89,45 @@ class TantivyIndex:
         enable_highlighting: bool = False,
         min_usability_score: float = 0.0,
         rank_by_usability: bool = True,
-    ) -> tuple[DocumentArray, list[float], DocumentHighlights]:
+    ) -> tuple[DocumentArray, ScoreArray, DocumentHighlights]:
         logger.debug("Searching Tantivy index with query: {}", query)
-        parsed_query = self.index.parse_query(query, default_field_names=DOC_FIELDS)
+        parsed_query = self._parse_query(query)
         searcher = self.index.searcher()
 
+        search_query = parsed_query
+        if min_usability_score > 0:
+            # Let Tantivy drop documents below the usability threshold so that they are never
+            # loaded from the document store
+            # NOTE: The filter has a constant score of 0 so that it does not change the ranking
+            usability_filter = tantivy.Query.const_score_query(
+                tantivy.Query.range_query(
+                    self.schema,
+                    "usability",
+                    tantivy.FieldType.Float,
+                    min_usability_score,
+                    float("inf"),
+                ),
+                0.0,
+            )
+            search_query = tantivy.Query.boolean_query(
+                [(tantivy.Occur.Must, parsed_query), (tantivy.Occur.Must, usability_filter)]
+            )
+
         search_start = time.perf_counter()
-        search_result = searcher.search(parsed_query, limit=MAX_DOCS).hits
+        search_result = searcher.search(search_query, limit=MAX_DOCS).hits
         logger.info("Tantivy search took {:.5f}s", time.perf_counter() - search_start)
         logger.info("Tantivy search took {:.5f}s", time.perf_counter() - search_start)
 
         results: list[int] = []
         scores: list[float] = []
+        usability_scores: list[float] = []
         highlights: DocumentHighlights = defaultdict(dict)
 
+        # The snippet generators only depend on the query and the field, so we create them once
+        snippet_generators = (
+            self._create_snippet_generators(searcher, parsed_query) if enable_highlighting else {}
+        )
+
         process_start = time.perf_counter()
         for score, doc_address in search_result:
             doc = searcher.doc(doc_address)
@@ -95,41 +143,66 @@ class TantivyIndex:
                     doc_id,
                 )
                 continue
-            if rank_by_usability:
-                scores.append(usability_score * score)
-            else:
-                scores.append(score)
             results.append(doc_id)
+            scores.append(score)
+            usability_scores.append(usability_score)
 
             if enable_highlighting:
-                for field in DOC_FIELDS:
-                    # NOTE: Recreating the snippet generators for each result doc is inefficient
-                    snippet_generator = tantivy.SnippetGenerator.create(
-                        searcher, parsed_query, self.schema, field
-                    )
-                    snippet_generator.set_max_num_chars(10000)
-                    snippet = snippet_generator.snippet_from_doc(doc)
-                    highlighted = snippet.highlighted()
-                    if len(highlighted) == 0:
-                        continue
-                    html_snippet: str = doc.get_first(field) or ""
-                    offset = 0
-                    for fragment in highlighted:
-                        start = fragment.start
-                        end = fragment.end
-                        html_snippet = (
-                            html_snippet[: start + offset]
-                            + "<mark>"
-                            + html_snippet[start + offset : end + offset]
-                            + "</mark>"
-                            + html_snippet[end + offset :]
-                        )
-                        offset += len("<mark></mark>")
-
-                    field_name = field
-                    if field in {"creator", "publisher"}:
-                        field_name += "-name"
-                    highlights[doc_id][field_name] = html_snippet
+                doc_highlights = self._highlight_document(doc, snippet_generators)
+                if doc_highlights:
+                    highlights[doc_id] = doc_highlights
+
+        # Convert the results to arrays once and weight all scores at the same time
+        result_array = np.array(results, dtype=np.uint32)
+        score_array = np.array(scores, dtype=np.float64)
+        if rank_by_usability:
+            score_array *= np.array(usability_scores, dtype=np.float64)
 
         logger.info("Processing results took {:.5f}s", time.perf_counter() - process_start)
-        return np.array(results, dtype=np.uint32), scores, highlights
+        return result_array, score_array, highlights
+
+    def _parse_query_uncached(self, query: str) -> tantivy.Query:
+        return self.index.parse_query(query, default_field_names=list(DOC_FIELDS))
+
+    def _create_snippet_generators(
+        self, searcher: tantivy.Searcher, parsed_query: tantivy.Query
+    ) -> dict[str, tantivy.SnippetGenerator]:
+        """Create one snippet generator per highlighted field for a query."""
+        snippet_generators: dict[str, tantivy.SnippetGenerator] = {}
+        for field in DOC_FIELDS:
+            snippet_generator = tantivy.SnippetGenerator.create(
+                searcher, parsed_query, self.schema, field
+            )
+            snippet_generator.set_max_num_chars(10000)
+            snippet_generators[field] = snippet_generator
+        return snippet_generators
+
+    def _highlight_document(
+        self, doc: tantivy.Document, snippet_generators: dict[str, tantivy.SnippetGenerator]
+    ) -> dict[str, str]:
+        """Mark the query matches in the fields of a document with HTML tags."""
+        doc_highlights: dict[str, str] = {}
+        for field, snippet_generator in snippet_generators.items():
+            # Skip fields that the document does not populate before creating a snippet
+            # NOTE: We cannot skip fields that do not contain a query term as a substring because
+            # the fields are stemmed (e.g., "hearts" matches "heart")
+            # NOTE: We need the full text because the highlighted snippet covers the whole field.
+            # Reading it is cheap compared to snippet_from_doc, which tokenizes the field again.
+            text: str | None = doc.get_first(field)
+            if not text:
+                continue
+            snippet = snippet_generator.snippet_from_doc(doc)
+            highlighted = snippet.highlighted()
+            if len(highlighted) == 0:
+                continue
+            # Assemble the snippet in a single pass instead of re-slicing the text per fragment
+            parts: list[str] = []
+            position = 0
+            for fragment in sorted(highlighted, key=lambda fragment: fragment.start):
+                start, end = fragment.start, fragment.end
+                parts.extend((text[position:start], "<mark>", text[start:end], "</mark>"))
+                position = end
+            parts.append(text[position:])
+            html_snippet = "".join(parts)
+            doc_highlights[HIGHLIGHT_FIELD_NAMES[field]] = html_snippet
+        return doc_highlights
@@ -1,12 +1,16 @@
+from functools import lru_cache
 from pathlib import Path
-from typing import TYPE_CHECKING
+from threading import Lock
+from typing import TYPE_CHECKING, Any
 
 import hnswlib
 import numpy as np
+import torch
 from loguru import logger
 from sentence_transformers import SentenceTransformer
 
 from backend.config import ColumnArray, ColumnSearchError, Metadata
+from backend.utils import load_json
 
 if TYPE_CHECKING:
     from collections.abc import Callable
@@ -14,6 +18,24 @@ if TYPE_CHECKING:
     from numpy.typing import NDArray
 
 
+# Name of the file next to the HNSW index that records how the index was built
+INDEX_MANIFEST_FILE = "index_names.json"
+
+
+def canonicalize_name(name: str) -> str:
+    """Lowercase a column name and collapse its whitespace."""
+    return " ".join(name.lower().split())
+
+
+def _load_manifest(index_path: Path) -> dict[str, Any]:
+    """Load the manifest that generate_embedding_index wrote next to an HNSW index.
+
+    Indices without a manifest were built from the raw column names with an unquantized model.
+    """
+    manifest_path = index_path.with_name(INDEX_MANIFEST_FILE)
+    return load_json(manifest_path) if manifest_path.exists() else {}
+
+
 class HnswIndex:
     def __init__(
         self,
@@ -22,55 +44,86 @@ class HnswIndex:
         model: str = "sentence-transformers/all-MiniLM-L6-v2",
         use_embeddings: bool = True,
         ef: int = 50,
+        embedding_cache_size: int = 4096,
     ) -> None:
-        self.name_to_vector = metadata.name_to_vector
-        self.vector_to_name = [""] * len(self.name_to_vector)
-        for name, vector in self.name_to_vector.items():
-            self.vector_to_name[vector] = name
-        self.vector_to_cols = metadata.vector_to_cols
+        self._set_metadata(metadata)
+        self.path = path
+        self.model = model
         self.use_embeddings = use_embeddings
+        self.ef = ef
         self.embedder: SentenceTransformer | None = None
+        self.index: hnswlib.Index | None = None
+        self.canonicalize_names = False
+        self._load_lock = Lock()
+        # NOTE: Don't use lru_cache on methods
+        # See https://docs.astral.sh/ruff/rules/cached-instance-method/ for details
+        self._encode = lru_cache(maxsize=embedding_cache_size)(self._encode_name)
 
         if not use_embeddings:
             logger.debug("Not loading SentenceTransformer model")
-            return
-
-        # Embedding model
-        logger.debug("Loading SentenceTransformer model '{}'", model)
-        self.embedder = SentenceTransformer(
-            model_name_or_path=model,
-            cache_folder=(path.parent / "model_cache").as_posix(),
-            # Possibly use ONNX, see: https://github.com/lbhm/fainder-demo/issues/102
-            # backend="onnx",
-            # model_kwargs={"file_name": "onnx/model_O2.onnx"},
-        )
-        dimension = self.embedder.get_sentence_embedding_dimension()
-        if dimension is None:
-            raise ValueError("Dimension of the model is not known, cannot initialize HNSW index")
-        self.dimension = dimension
-        logger.debug("Model loaded")
-
-        # HNSW index
-        logger.debug("Loading HNSW index")
-        self.ef = ef
-        self.index = hnswlib.Index(space="cosine", dim=self.dimension)
-        self.index.load_index(str(path))
-        self.index.set_ef(self.ef)
-        logger.debug("HNSW index loaded")
+        else:
+            # NOTE: The model and the HNSW index are only needed for approximate searches, so we
+            # defer loading them until the first one to reduce startup time and memory usage
+            logger.debug("Deferring SentenceTransformer model and HNSW index loading")
 
     def update(self, path: Path, metadata: Metadata) -> None:
-        self.name_to_vector = metadata.name_to_vector
-        self.vector_to_name = [""] * len(self.name_to_vector)
-        for name, vector in self.name_to_vector.items():
-            self.vector_to_name[vector] = name
-        self.vector_to_cols = metadata.vector_to_cols
-
-        if not self.use_embeddings:
-            return
-
-        self.index = hnswlib.Index(space="cosine", dim=self.dimension)
-        self.index.load_index(str(path))
-        self.index.set_ef(self.ef)
+        self._set_metadata(metadata)
+        self.path = path
+
+        with self._load_lock:
+            if self.index is None:
+                # The new index is loaded together with the model on the first approximate search
+                return
+
+            index = hnswlib.Index(space="cosine", dim=self.index.dim)
+            index.load_index(str(path))
+            index.set_ef(self.ef)
+            self.index = index
+            self.canonicalize_names = bool(_load_manifest(path).get("canonicalize_names", False))
+            self._encode.cache_clear()
+
+    def _load_embeddings(self) -> tuple[SentenceTransformer, hnswlib.Index]:
+        with self._load_lock:
+            if self.embedder is not None and self.index is not None:
+                return self.embedder, self.index
+
+            manifest = _load_manifest(self.path)
+            self.canonicalize_names = bool(manifest.get("canonicalize_names", False))
+
+            # Embedding model
+            logger.debug("Loading SentenceTransformer model '{}'", self.model)
+            embedder = SentenceTransformer(
+                model_name_or_path=self.model,
+                cache_folder=(self.path.parent / "model_cache").as_posix(),
+                # Possibly use ONNX, see: https://github.com/lbhm/fainder-demo/issues/102
+                # backend="onnx",
+                # model_kwargs={"file_name": "onnx/model_O2.onnx"},
+            )
+            # NOTE: Queries must be embedded by the same model as the indexed names, so we only
+            # reduce the precision of the model like generate_embedding_index did for this index
+            if manifest.get("quantization") == "int8" and embedder.device.type == "cpu":
+                torch.ao.quantization.quantize_dynamic(
+                    embedder, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+                )
+            elif manifest.get("dtype") == "float16" and embedder.device.type == "cuda":
+                embedder.half()
+            dimension = embedder.get_sentence_embedding_dimension()
+            if dimension is None:
+                raise ValueError(
+                    "Dimension of the model is not known, cannot initialize HNSW index"
+                )
+            logger.debug("Model loaded")
+
+            # HNSW index
+            logger.debug("Loading HNSW index")
+            index = hnswlib.Index(space="cosine", dim=dimension)
+            index.load_index(str(self.path))
+            index.set_ef(self.ef)
+            logger.debug("HNSW index loaded")
+
+            self.embedder = embedder
+            self.index = index
+            return embedder, index
 
     def search(
         self, column_name: str, k: int, column_filter: set[np.uint32] | None
@@ -78,40 +131,75 @@ class HnswIndex:
         if k < 0:
             raise ColumnSearchError(f"k must be a non-negative integer: {k}")
 
-        result: set[np.uint32] = set()
         if k == 0:
             # Exact search
-            vector_id = self.name_to_vector.get(column_name, None)
-            if vector_id:
-                col_ids = self.vector_to_cols.get(vector_id, set())
-                result |= {np.uint32(col_id) for col_id in col_ids}
-        else:
-            if self.embedder is None:
-                raise ColumnSearchError("Embedding model is not available for approximate search")
+            # NOTE: The column IDs of a vector are unique, so we can return a copy of them directly
+            vector_id = self.name_to_vector.get(column_name)
+            if vector_id is None:
+                return np.empty(0, dtype=np.uint32)
+            return self.col_ids[
+                self.col_offsets[vector_id] : self.col_offsets[vector_id + 1]
+            ].copy()
 
-            # Nearest neighbor search
-            embedding: NDArray[np.float32] = self.embedder.encode(  # pyright: ignore[reportUnknownMemberType, reportUnknownVariableType]
-                column_name, convert_to_numpy=True, normalize_embeddings=True
-            )
+        if not self.use_embeddings:
+            raise ColumnSearchError("Embedding model is not available for approximate search")
 
-            if column_name in self.name_to_vector:
-                # If the column name exists in the index, it will be returned as the first result
-                k += 1
-            filter_fn: Callable[[int], bool] | None = (
-                (lambda id_: id_ in column_filter) if column_filter else None
-            )
-            vector_ids, distances = self.index.knn_query(embedding, k=k, filter=filter_fn)
-            result |= {
-                np.uint32(col_id)
-                for vector_id in vector_ids[0]
-                for col_id in self.vector_to_cols[vector_id]
-            }
-            logger.debug(
-                "Column search '{}' with k={} returned neighbors {} with distances {}",
-                column_name,
-                k,
-                [self.vector_to_name[vector_id] for vector_id in vector_ids[0]],
-                distances[0],
-            )
+        # Nearest neighbor search
+        _, index = self._load_embeddings()
+        embedding = self._encode(column_name)
+
+        if column_name in self.name_to_vector:
+            # If the column name exists in the index, it will be returned as the first result
+            k += 1
+        filter_fn: Callable[[int], bool] | None = (
+            (lambda id_: id_ in column_filter) if column_filter else None
+        )
+        vector_ids, distances = index.knn_query(embedding, k=k, filter=filter_fn)
+        # NOTE: The neighbor names are only looked up if debug logging is enabled
+        logger.opt(lazy=True).debug(
+            "Column search '{}' with k={} returned neighbors {} with distances {}",
+            lambda: column_name,
+            lambda: k,
+            lambda: [self.vector_to_name[vector_id] for vector_id in vector_ids[0]],
+            lambda: distances[0],
+        )
 
-        return np.array(list(result), dtype=np.uint32)
+        # NOTE: Each column belongs to exactly one vector, so the columns of distinct neighbors are
+        # disjoint and their concatenation does not contain duplicates
+        starts = self.col_offsets[vector_ids[0]]
+        ends = self.col_offsets[vector_ids[0] + 1]
+        return np.concatenate(
+            [self.col_ids[start:end] for start, end in zip(starts, ends, strict=True)],
+            dtype=np.uint32,
+        )
+
+    def _set_metadata(self, metadata: Metadata) -> None:
+        self.name_to_vector = metadata.name_to_vector
+        # Scatter the names into their vector positions instead of assigning them one by one
+        self.vector_to_name = np.empty(len(self.name_to_vector), dtype=object)
+        self.vector_to_name[np.fromiter(self.name_to_vector.values(), dtype=np.intp)] = list(
+            self.name_to_vector
+        )
+
+        # Store the columns of all vectors in a single CSR-style array, where the columns of
+        # vector i are col_ids[col_offsets[i] : col_offsets[i + 1]]
+        vector_to_cols = metadata.vector_to_cols
+        self.col_offsets = np.zeros(len(vector_to_cols) + 1, dtype=np.intp)
+        np.cumsum([len(cols) for cols in vector_to_cols], out=self.col_offsets[1:])
+        self.col_ids: NDArray[np.uint32] = (
+            np.concatenate(vector_to_cols, dtype=np.uint32)
+            if vector_to_cols
+            else np.empty(0, dtype=np.uint32)
+        )
+
+    def _encode_name(self, column_name: str) -> "NDArray[np.float32]":
+        embedder, _ = self._load_embeddings()
+        if self.canonicalize_names:
+            # Encode queries like the indexed names
+            column_name = canonicalize_name(column_name)
+        embedding: NDArray[np.float32] = embedder.encode(  # pyright: ignore[reportUnknownMemberType, reportUnknownVariableType]
+            column_name, convert_to_numpy=True, normalize_embeddings=True
+        )
+        # The embedding is shared between cache hits, so it must not be modified
+        embedding.flags.writeable = False
+        return embedding
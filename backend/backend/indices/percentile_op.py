@@ -1,7 +1,10 @@
 import atexit
 import os
+from collections import OrderedDict
+from functools import partial
 from pathlib import Path
-from typing import TYPE_CHECKING
+from threading import Lock
+from typing import TYPE_CHECKING, Literal
 
 import numpy as np
 from fainder.execution.new_runner import run_approx, run_exact, run_exact_parallel
@@ -12,12 +15,90 @@ from loguru import logger
 from backend.config import ColumnArray, FainderError, FainderMode
 
 if TYPE_CHECKING:
-    import numpy as np
+    from collections.abc import Callable
+
     from fainder.typing import Histogram
     from fainder.typing import PercentileIndex as PctlIndex
     from fainder.typing import PercentileQuery as PctlQuery
     from numpy.typing import NDArray
 
+    FainderIndexData = tuple[list[PctlIndex], list[NDArray[np.float64]]]
+    SearchFunction = Callable[[PctlQuery, str, ColumnArray | None], tuple[ColumnArray, float]]
+    CacheKey = tuple[PctlQuery, FainderMode, str, bytes | None]
+
+
+# Filters above this size are not worth hashing for the result cache
+MAX_CACHED_FILTER_SIZE = 10_000
+# Results above this size are not cached so that the cache size bounds its memory usage
+MAX_CACHED_RESULT_SIZE = 100_000
+
+
+class _ResultCache:
+    """Thread-safe LRU cache of search results that does not store results above a size."""
+
+    def __init__(self, maxsize: int, max_result_size: int) -> None:
+        self.maxsize = maxsize
+        self.max_result_size = max_result_size
+        self._results: OrderedDict[CacheKey, ColumnArray] = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: "CacheKey") -> ColumnArray | None:
+        with self._lock:
+            result = self._results.get(key)
+            if result is not None:
+                self._results.move_to_end(key)
+            return result
+
+    def put(self, key: "CacheKey", result: ColumnArray) -> None:
+        if self.maxsize <= 0 or result.size > self.max_result_size:
+            return
+        # The result is shared between cache hits, so it must not be modified
+        result.flags.writeable = False
+        with self._lock:
+            self._results[key] = result
+            self._results.move_to_end(key)
+            if len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
+
+
+def _normalize_filter(hist_filter: ColumnArray) -> ColumnArray:
+    """Return the histogram filter as a sorted, duplicate-free, contiguous uint32 array."""
+    hist_filter = np.ascontiguousarray(hist_filter, dtype=np.uint32)
+    # Most filters are results of set operations that are already sorted and unique
+    if np.all(hist_filter[1:] > hist_filter[:-1]):
+        return hist_filter
+    return np.unique(hist_filter)
+
+
+class _LazyIndexes:
+    """Fainder indexes by configuration name that are loaded on their first access."""
+
+    def __init__(self, index_type: str, paths: dict[str, Path]) -> None:
+        self.index_type = index_type
+        self.paths: dict[str, Path] = {}
+        for key, path in paths.items():
+            if path.exists():
+                self.paths[key] = path
+            else:
+                logger.warning(f"{index_type.capitalize()} index path {path} does not exist")
+        self._indexes: dict[str, FainderIndexData] = {}
+        # NOTE: One lock per index lets threads that need different indexes load them in
+        # parallel, which overlaps the file reads and zstd decompression that release the GIL
+        self._locks = {key: Lock() for key in self.paths}
+
+    def __getitem__(self, name: str) -> "FainderIndexData":
+        index = self._indexes.get(name)
+        if index is not None:
+            return index
+        if name not in self.paths:
+            raise FainderError(f"Index '{name}' not found in {self.index_type} indexes.")
+
+        with self._locks[name]:
+            if name not in self._indexes:
+                logger.info(f"Loading {self.index_type} index from {self.paths[name]}")
+                self._indexes[name] = load_input(self.paths[name], f"{self.index_type} index")
+            return self._indexes[name]
+
 
 class FainderIndex:
     def __init__(
@@ -28,47 +109,35 @@ class FainderIndex:
         num_workers: int = (os.cpu_count() or 1) - 1,
         num_chunks: int = (os.cpu_count() or 1) - 1,
         chunk_layout: FainderChunkLayout = FainderChunkLayout.ROUND_ROBIN,
+        cache_size: int = 128,
+        max_cached_result_size: int = MAX_CACHED_RESULT_SIZE,
     ) -> None:
-        self.rebinning_indexes: (
-            dict[str, tuple[list[PctlIndex], list[NDArray[np.float64]]]] | None
-        ) = None
-        self.conversion_indexes: (
-            dict[str, tuple[list[PctlIndex], list[NDArray[np.float64]]]] | None
-        ) = None
-        self.hists: list[tuple[np.uint32, Histogram]] | None = None
+        self.parallel = num_workers > 1
 
-        if histogram_path is not None and histogram_path.exists():
-            logger.info(f"Loading histograms from {histogram_path}")
-            self.hists = load_input(histogram_path, "histograms")
+        # NOTE: The histograms are only used by the sequential exact mode, the parallel processor
+        # loads its own chunks of them in the worker processes
+        self.histogram_path = histogram_path if not self.parallel else None
+        self.hists: list[tuple[np.uint32, Histogram]] | None = None
+        self._hists_lock = Lock()
 
-        # load rebinning indexes
+        # NOTE: Indexes are loaded on their first search because most deployments only query a
+        # subset of the Fainder modes and index configurations
         if rebinning_paths:
-            self.rebinning_indexes = {}
-            for key, path in rebinning_paths.items():
-                if path.exists():
-                    logger.info(f"Loading rebinning index from {path}")
-                    self.rebinning_indexes[key] = load_input(path, "rebinning index")
-                else:
-                    logger.warning(f"Rebinning index path {path} does not exist")
+            self.rebinning_indexes: _LazyIndexes | None = _LazyIndexes(
+                "rebinning", rebinning_paths
+            )
         else:
             logger.warning("No rebinning paths provided, rebinning index will not be loaded")
             self.rebinning_indexes = None
 
-        # load conversion indexes
         if conversion_paths:
-            self.conversion_indexes = {}
-            for key, path in conversion_paths.items():
-                if path.exists():
-                    logger.info(f"Loading conversion index from {path}")
-                    self.conversion_indexes[key] = load_input(path, "conversion index")
-                else:
-                    logger.warning(f"Conversion index path {path} does not exist")
+            self.conversion_indexes: _LazyIndexes | None = _LazyIndexes(
+                "conversion", conversion_paths
+            )
         else:
             logger.warning("No conversion paths provided, conversion index will not be loaded")
             self.conversion_indexes = None
 
-        self.parallel = num_workers > 1
-
         self.num_workers = num_workers
 
         self.parallel_processor: ParallelHistogramProcessor | None = None
@@ -85,6 +154,36 @@ class FainderIndex:
 
         atexit.register(self._cleanup_parallel_processor)
 
+        # Resolve the search function of each mode once instead of on every query
+        self._search_fns: dict[FainderMode, SearchFunction] = {
+            FainderMode.LOW_MEMORY: partial(
+                self._search_approx,
+                FainderMode.LOW_MEMORY,
+                self.rebinning_indexes,
+                "rebinning",
+                "recall",
+            ),
+            FainderMode.FULL_PRECISION: partial(
+                self._search_approx,
+                FainderMode.FULL_PRECISION,
+                self.conversion_indexes,
+                "conversion",
+                "precision",
+            ),
+            FainderMode.FULL_RECALL: partial(
+                self._search_approx,
+                FainderMode.FULL_RECALL,
+                self.conversion_indexes,
+                "conversion",
+                "recall",
+            ),
+            FainderMode.EXACT: (
+                self._search_exact_parallel if self.parallel else self._search_exact
+            ),
+        }
+
+        self._result_cache = _ResultCache(cache_size, max_cached_result_size)
+
     def _cleanup_parallel_processor(self) -> None:
         """Clean up parallel processor when the program exits."""
         if self.parallel_processor is not None:
@@ -92,7 +191,74 @@ class FainderIndex:
             self.parallel_processor.shutdown()
             self.parallel_processor = None
 
-    def search(  # noqa: C901
+    def _load_histograms(self) -> "list[tuple[np.uint32, Histogram]] | None":
+        with self._hists_lock:
+            if self.hists is None and self.histogram_path is not None:
+                if self.histogram_path.exists():
+                    logger.info(f"Loading histograms from {self.histogram_path}")
+                    self.hists = load_input(self.histogram_path, "histograms")
+                else:
+                    logger.warning(f"Histogram path {self.histogram_path} does not exist")
+                # Only try to load the histograms once
+                self.histogram_path = None
+            return self.hists
+
+    def _search_approx(
+        self,
+        fainder_mode: FainderMode,
+        indexes: "_LazyIndexes | None",
+        index_type: str,
+        index_mode: Literal["precision", "recall"],
+        query: "PctlQuery",
+        index_name: str,
+        hist_filter: ColumnArray | None,
+    ) -> tuple[ColumnArray, float]:
+        if indexes is None:
+            raise FainderError(
+                f"{index_type.capitalize()} index must be loaded for {fainder_mode} mode."
+            )
+
+        return run_approx(
+            fainder_index=indexes[index_name],
+            query=query,
+            index_mode=index_mode,
+            id_filter=hist_filter,
+        )
+
+    def _search_exact(
+        self, query: "PctlQuery", index_name: str, hist_filter: ColumnArray | None
+    ) -> tuple[ColumnArray, float]:
+        hists = self._load_histograms()
+        if self.conversion_indexes is None or hists is None:
+            raise FainderError("Conversion index and histograms must be loaded for exact mode.")
+
+        return run_exact(
+            fainder_index=self.conversion_indexes[index_name],
+            hists=hists,
+            query=query,
+            id_filter=hist_filter,
+        )
+
+    def _search_exact_parallel(
+        self, query: "PctlQuery", index_name: str, hist_filter: ColumnArray | None
+    ) -> tuple[ColumnArray, float]:
+        if self.conversion_indexes is None:
+            raise FainderError("Conversion index must be loaded for exact mode.")
+
+        conversion_index = self.conversion_indexes[index_name]
+        if self.parallel_processor is None:
+            raise FainderError(
+                "Parallel processor is not initialized. Cannot run exact mode in parallel."
+            )
+
+        return run_exact_parallel(
+            fainder_index=conversion_index,
+            query=query,
+            parallel_processor=self.parallel_processor,
+            id_filter=hist_filter,
+        )
+
+    def search(
         self,
         percentile: float,
         comparison: str,
@@ -107,101 +273,58 @@ class FainderIndex:
                 f"Invalid percentile predicate: {percentile};{comparison};{reference}"
             )
 
-        result: ColumnArray
-
         query: PctlQuery = (percentile, comparison, reference)  # type: ignore[assignment]
-        match fainder_mode:
-            case FainderMode.LOW_MEMORY:
-                if self.rebinning_indexes is None:
-                    raise FainderError("Rebinning index must be loaded for low_memory mode.")
-
-                rebinning_index = self.rebinning_indexes.get(index_name)
-                if rebinning_index is None:
-                    raise FainderError(f"Index '{index_name}' not found in rebinning indexes.")
-
-                result, runtime = run_approx(
-                    fainder_index=rebinning_index,
-                    query=query,
-                    index_mode="recall",
-                    id_filter=hist_filter,
-                )
-            case FainderMode.FULL_PRECISION:
-                if self.conversion_indexes is None:
-                    raise FainderError("Conversion index must be loaded for full_precision mode.")
-
-                conversion_index = self.conversion_indexes.get(index_name)
-                if conversion_index is None:
-                    raise FainderError(f"Index '{index_name}' not found in conversion indexes.")
-
-                result, runtime = run_approx(
-                    fainder_index=conversion_index,
-                    query=query,
-                    index_mode="precision",
-                    id_filter=hist_filter,
-                )
-            case FainderMode.FULL_RECALL:
-                if self.conversion_indexes is None:
-                    raise FainderError("Conversion index must be loaded for full_recall mode.")
-
-                conversion_index = self.conversion_indexes.get(index_name)
-                if conversion_index is None:
-                    raise FainderError(f"Index '{index_name}' not found in conversion indexes.")
-
-                result, runtime = run_approx(
-                    fainder_index=conversion_index,
-                    query=query,
-                    index_mode="recall",
-                    id_filter=hist_filter,
-                )
-            case FainderMode.EXACT:
-                if not self.parallel:
-                    if self.conversion_indexes is None or self.hists is None:
-                        raise FainderError(
-                            "Conversion index and histograms must be loaded for exact mode."
-                        )
-                    conversion_index = self.conversion_indexes.get(index_name)
-                    if conversion_index is None:
-                        raise FainderError(
-                            f"Index '{index_name}' not found in conversion indexes."
-                        )
-
-                    result, runtime = run_exact(
-                        fainder_index=conversion_index,
-                        hists=self.hists,
-                        query=query,
-                        id_filter=hist_filter,
-                    )
-                else:
-                    if self.conversion_indexes is None:
-                        raise FainderError("Conversion index must be loaded for exact mode.")
-
-                    conversion_index = self.conversion_indexes.get(index_name)
-                    if conversion_index is None:
-                        raise FainderError(
-                            f"Index '{index_name}' not found in conversion indexes."
-                        )
-
-                    if self.parallel_processor is None:
-                        raise FainderError(
-                            "Parallel processor is not initialized. "
-                            "Cannot run exact mode in parallel."
-                        )
-
-                    result, runtime = run_exact_parallel(
-                        fainder_index=conversion_index,
-                        query=query,
-                        parallel_processor=self.parallel_processor,
-                        id_filter=hist_filter,
-                    )
-
-        logger.info(
-            "Query '{}' ({} mode) returned {} histograms in {} seconds. With filter size: {}. Using num_workers: {}",
-            query,
-            fainder_mode,
-            len(result),
-            f"{runtime:.2f}",
-            hist_filter.size if hist_filter is not None else "no filter",
-            self.num_workers
+        if hist_filter is None:
+            return self._search_cached(query, fainder_mode, index_name, None, None)
+        if hist_filter.size == 0:
+            # No histogram can match an empty filter
+            return np.empty(0, dtype=np.uint32)
+        # NOTE: A normalized filter lets Fainder intersect sorted arrays and makes equal filters
+        # share a cache entry regardless of the order of their IDs
+        hist_filter = _normalize_filter(hist_filter)
+        if hist_filter.size <= MAX_CACHED_FILTER_SIZE:
+            return self._search_cached(
+                query, fainder_mode, index_name, hist_filter, hist_filter.tobytes()
+            )
+        return self._search(query, fainder_mode, index_name, hist_filter)
+
+    def _search_cached(
+        self,
+        query: "PctlQuery",
+        fainder_mode: FainderMode,
+        index_name: str,
+        hist_filter: ColumnArray | None,
+        filter_key: bytes | None,
+    ) -> ColumnArray:
+        key: CacheKey = (query, fainder_mode, index_name, filter_key)
+        result = self._result_cache.get(key)
+        if result is None:
+            result = self._search(query, fainder_mode, index_name, hist_filter)
+            self._result_cache.put(key, result)
+        return result
+
+    def _search(
+        self,
+        query: "PctlQuery",
+        fainder_mode: FainderMode,
+        index_name: str,
+        hist_filter: ColumnArray | None,
+    ) -> ColumnArray:
+        search_fn = self._search_fns.get(fainder_mode)
+        if search_fn is None:
+            raise FainderError(f"Invalid Fainder mode: {fainder_mode}")
+        result, runtime = search_fn(query, index_name, hist_filter)
+
+        # Only evaluate the log arguments if the message is emitted
+        logger.opt(lazy=True).info(
+            "Query '{}' ({} mode) returned {} histograms in {:.2f} seconds. "
+            "With filter size: {}. Using num_workers: {}",
+            lambda: query,
+            lambda: fainder_mode,
+            lambda: len(result),
+            lambda: runtime,
+            lambda: hist_filter.size if hist_filter is not None else "no filter",
+            lambda: self.num_workers,
         )
 
         return result
@@ -7,18 +7,16 @@ from loguru import logger
 
 def dump_json(obj: dict[str, Any], path: Path) -> None:
     if not path.parent.exists():
-        path.mkdir(parents=True)
+        path.parent.mkdir(parents=True)
 
-    with path.open("wb") as file:
-        file.write(orjson.dumps(obj))
+    path.write_bytes(orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY))
 
 
 def load_json(path: Path) -> dict[str, Any]:
     if not path.exists():
         raise FileNotFoundError
     try:
-        with path.open("rb") as file:
-            return orjson.loads(file.read())  # type: ignore[no-any-return]
+        return orjson.loads(path.read_bytes())  # type: ignore[no-any-return]
     except orjson.JSONDecodeError as e:
         logger.error("Error parsing JSON from {}: {}", path, e)
         return {}
@@ -605,6 +605,25 @@ EXECUTOR_CASES: dict[str, dict[str, ExecutorCase]] = {
                 ],
             ),
         },
+        # NOTE: Regression test for the column name with vector ID 0
+        "column_name_first_vector": {
+            "query": "col(name('City'; 0))",
+            "expected": [0],
+            "parse_tree": Tree(
+                Token("RULE", "query"),
+                [
+                    Tree(
+                        Token("RULE", "col_op"),
+                        [
+                            Tree(
+                                Token("RULE", "name_op"),
+                                [Token("STRING", "'City'"), Token("INT", "0")],
+                            )
+                        ],
+                    )
+                ],
+            ),
+        },
         "percentile_with_identifer": {
             "query": "col(name('AveragePrice'; 0) AND pp(0.5;ge;0.75))",
             "expected": [1],
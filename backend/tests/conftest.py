@@ -1,14 +1,56 @@
 import sys
+import zlib
 from collections.abc import Generator
 from pathlib import Path
+from types import SimpleNamespace
 from typing import Any
 
+import numpy as np
 import pytest
+import torch
 from loguru import logger
+from numpy.typing import NDArray
 
+from backend import indexing
 from backend.config import ExecutorType, Metadata, Settings
 from backend.engine import Engine, Parser
-from backend.indices import FainderIndex, HnswIndex, TantivyIndex
+from backend.indices import FainderIndex, HnswIndex, TantivyIndex, name_op
+
+
+class FakeEmbedder:
+    """Stand-in for SentenceTransformer with deterministic embeddings that records its inputs."""
+
+    dim = 16
+    device = SimpleNamespace(type="cpu")
+    encoded: list[str] = []  # noqa: RUF012
+
+    def __init__(self, **_: object) -> None:
+        pass
+
+    @classmethod
+    def embed(cls, sentence: str) -> NDArray[np.float32]:
+        embedding = np.random.default_rng(zlib.crc32(sentence.encode())).standard_normal(cls.dim)
+        return (embedding / np.linalg.norm(embedding)).astype(np.float32)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def encode(self, sentences: str | list[str], **_: object) -> NDArray[np.float32]:
+        if isinstance(sentences, str):
+            FakeEmbedder.encoded.append(sentences)
+            return self.embed(sentences)
+        FakeEmbedder.encoded.extend(sentences)
+        return np.array([self.embed(sentence) for sentence in sentences]).reshape(-1, self.dim)
+
+
+@pytest.fixture
+def fake_embedder(monkeypatch: pytest.MonkeyPatch) -> type[FakeEmbedder]:
+    """Replace the SentenceTransformer of the indexing and the name index with FakeEmbedder."""
+    monkeypatch.setattr(FakeEmbedder, "encoded", [])
+    monkeypatch.setattr(indexing, "SentenceTransformer", FakeEmbedder)
+    monkeypatch.setattr(name_op, "SentenceTransformer", FakeEmbedder)
+    monkeypatch.setattr(torch.cuda, "is_available", lambda: False)
+    return FakeEmbedder
 
 
 @pytest.fixture(autouse=True, scope="module")
@@ -0,0 +1,90 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from backend.config import FainderMode, Settings
+from backend.indices import FainderIndex
+from backend.indices.percentile_op import MAX_CACHED_RESULT_SIZE
+
+
+def create_fainder_index(
+    cache_size: int = 128, max_cached_result_size: int = MAX_CACHED_RESULT_SIZE
+) -> FainderIndex:
+    settings = Settings(
+        data_dir=Path(__file__).parent / "assets",
+        collection_name="toy_collection",
+        _env_file=None,  # type: ignore[call-arg]
+    )
+    return FainderIndex(
+        rebinning_paths={"default": settings.rebinning_index_path},
+        conversion_paths={"default": settings.conversion_index_path},
+        histogram_path=settings.histogram_path,
+        num_workers=0,  # Use 0 to disable parallel processing in tests
+        cache_size=cache_size,
+        max_cached_result_size=max_cached_result_size,
+    )
+
+
+@pytest.mark.parametrize("fainder_mode", list(FainderMode))
+def test_cache_hit_returns_same_array(fainder_mode: FainderMode) -> None:
+    fainder_index = create_fainder_index()
+
+    result = fainder_index.search(0.5, "ge", 2000, fainder_mode, "default")
+    cached_result = fainder_index.search(0.5, "ge", 2000, fainder_mode, "default")
+
+    assert cached_result is result
+    assert not result.flags.writeable
+    with pytest.raises(ValueError, match="read-only"):
+        result[:] = 0
+
+
+def test_large_results_are_not_cached() -> None:
+    fainder_index = create_fainder_index(max_cached_result_size=0)
+
+    result = fainder_index.search(0.5, "ge", 2000, FainderMode.LOW_MEMORY, "default")
+    uncached_result = fainder_index.search(0.5, "ge", 2000, FainderMode.LOW_MEMORY, "default")
+
+    assert result.size > 0
+    assert uncached_result is not result
+    assert (uncached_result == result).all()
+    assert result.flags.writeable
+
+
+def test_least_recently_used_results_are_evicted() -> None:
+    fainder_index = create_fainder_index(cache_size=2)
+
+    first = fainder_index.search(0.5, "ge", 2000, FainderMode.LOW_MEMORY, "default")
+    second = fainder_index.search(0.5, "ge", 1000, FainderMode.LOW_MEMORY, "default")
+    assert fainder_index.search(0.5, "ge", 2000, FainderMode.LOW_MEMORY, "default") is first
+
+    # The third result evicts the second one because the first one was used more recently
+    fainder_index.search(0.5, "ge", 500, FainderMode.LOW_MEMORY, "default")
+    assert fainder_index.search(0.5, "ge", 2000, FainderMode.LOW_MEMORY, "default") is first
+    assert fainder_index.search(0.5, "ge", 1000, FainderMode.LOW_MEMORY, "default") is not second
+
+
+def test_empty_filter() -> None:
+    fainder_index = create_fainder_index()
+
+    result = fainder_index.search(
+        0.5, "ge", 2000, FainderMode.LOW_MEMORY, "default", np.empty(0, dtype=np.uint32)
+    )
+
+    assert result.size == 0
+
+
+@pytest.mark.parametrize("fainder_mode", list(FainderMode))
+def test_filter_normalization(fainder_mode: FainderMode) -> None:
+    fainder_index = create_fainder_index()
+    unfiltered_result = fainder_index.search(0.5, "ge", 2000, fainder_mode, "default")
+    assert unfiltered_result.size > 0
+
+    # An unsorted filter with duplicates is equivalent to its sorted and unique IDs
+    hist_filter = np.concatenate([unfiltered_result[::-1], unfiltered_result])
+    result = fainder_index.search(0.5, "ge", 2000, fainder_mode, "default", hist_filter)
+    assert set(result.tolist()) == set(unfiltered_result.tolist())
+
+    # Equal filters share a cache entry regardless of the order of their IDs
+    sorted_filter = np.sort(unfiltered_result)
+    assert fainder_index.search(0.5, "ge", 2000, fainder_mode, "default", sorted_filter) is result
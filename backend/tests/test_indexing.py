@@ -0,0 +1,195 @@
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import hnswlib
+import numpy as np
+
+from backend.config import Metadata
+from backend.indexing import generate_embedding_index, generate_metadata
+from backend.utils import dump_json, load_json
+
+if TYPE_CHECKING:
+    from .conftest import FakeEmbedder
+
+
+def build_index(
+    embedder: "type[FakeEmbedder]",
+    names: list[str],
+    output_path: Path,
+    seed: int = 42,
+    incremental: bool = True,
+) -> list[str]:
+    """Build the embedding index for the names and return the strings that were encoded."""
+    embedder.encoded.clear()
+    generate_embedding_index(
+        {name: vector_id for vector_id, name in enumerate(names)},
+        output_path,
+        show_progress_bar=False,
+        seed=seed,
+        num_threads=1,
+        quantize_on_cpu=False,
+        incremental=incremental,
+    )
+    return list(embedder.encoded)
+
+
+def index_size(embedder: "type[FakeEmbedder]", output_path: Path) -> int:
+    index = hnswlib.Index(space="cosine", dim=embedder.dim)
+    index.load_index((output_path / "index.bin").as_posix())
+    return index.get_current_count()
+
+
+def test_embedding_index_extend(fake_embedder: "type[FakeEmbedder]", tmp_path: Path) -> None:
+    names = ["City", "Age"]
+    assert build_index(fake_embedder, names, tmp_path) == ["city", "age"]
+    assert index_size(fake_embedder, tmp_path) == len(names)
+
+    # Appended names are added to the existing index
+    names.append("Country")
+    assert build_index(fake_embedder, names, tmp_path) == ["country"]
+    assert index_size(fake_embedder, tmp_path) == len(names)
+
+    # An index with all names is reused as is
+    assert build_index(fake_embedder, names, tmp_path) == []
+    assert index_size(fake_embedder, tmp_path) == len(names)
+
+
+def test_embedding_index_rebuild(fake_embedder: "type[FakeEmbedder]", tmp_path: Path) -> None:
+    build_index(fake_embedder, ["City", "Age"], tmp_path)
+
+    # The index is rebuilt if its names are not a prefix of the current names
+    names = ["Age", "City", "Country"]
+    assert build_index(fake_embedder, names, tmp_path) == ["age", "city", "country"]
+    assert index_size(fake_embedder, tmp_path) == len(names)
+
+    # The index is rebuilt if it was built with different parameters
+    assert build_index(fake_embedder, names, tmp_path, seed=7) == ["age", "city", "country"]
+    assert index_size(fake_embedder, tmp_path) == len(names)
+
+    # The index is rebuilt if incremental builds are disabled
+    assert build_index(fake_embedder, names, tmp_path, seed=7, incremental=False) == [
+        "age",
+        "city",
+        "country",
+    ]
+    assert index_size(fake_embedder, tmp_path) == len(names)
+
+
+def column(name: str, densities: list[float] | None = None) -> dict[str, Any]:
+    if densities is None:
+        return {"name": name}
+    bins = list(range(len(densities) + 1))
+    return {"name": name, "histogram": {"densities": densities, "bins": bins}}
+
+
+def load_metadata(
+    docs: dict[str, list[dict[str, Any]]], tmp_path: Path
+) -> tuple[list[tuple[np.uint32, tuple[Any, Any]]], Metadata]:
+    """Write one Croissant file per document and generate the metadata for them."""
+    croissant_path = tmp_path / "croissant"
+    croissant_path.mkdir()
+    for file_name, cols in docs.items():
+        dump_json(
+            {"name": file_name, "usability": 1.0, "recordSet": [{"field": cols}]},
+            croissant_path / f"{file_name}.json",
+        )
+    metadata_path = tmp_path / "metadata.json"
+    hists, _, _, _ = generate_metadata(
+        croissant_path, metadata_path, tmp_path / "tantivy", return_documents=False, workers=2
+    )
+    return hists, Metadata.model_validate_json(metadata_path.read_bytes())
+
+
+def test_metadata_mappings(tmp_path: Path) -> None:
+    hists, metadata = load_metadata(
+        {
+            "a": [column("City"), column("Age", [0.25, 0.75]), column("Year", [1.0])],
+            "b": [column("City"), column("Height", [0.5, 0.25, 0.25])],
+            "c": [column("Age", [1.0])],
+        },
+        tmp_path,
+    )
+
+    # Columns with a histogram get the first IDs so that they coincide with the histogram IDs
+    assert [int(hist_id) for hist_id, _ in hists] == [0, 1, 2, 3]
+    assert [densities.tolist() for _, (densities, _) in hists] == [
+        [0.25, 0.75],
+        [1.0],
+        [0.5, 0.25, 0.25],
+        [1.0],
+    ]
+    assert metadata.num_hists == len(hists)
+    assert [cols.tolist() for cols in metadata.doc_to_cols] == [[4, 0, 1], [5, 2], [3]]
+    assert metadata.col_to_doc.tolist() == [0, 0, 1, 2, 0, 1]
+    assert metadata.doc_to_path == ["a.json", "b.json", "c.json"]
+
+    # Vector IDs follow the first occurrence of each name and group all columns of the name
+    assert metadata.name_to_vector == {"City": 0, "Age": 1, "Year": 2, "Height": 3}
+    assert [cols.tolist() for cols in metadata.vector_to_cols] == [[4, 5], [0, 3], [1], [2]]
+
+
+def test_metadata_writes_ids_back(tmp_path: Path) -> None:
+    docs = {"a": [column("City"), column("Age", [0.2, 0.8])], "b": [column("Year", [1.0])]}
+    _, metadata = load_metadata(docs, tmp_path)
+
+    json_doc = load_json(tmp_path / "croissant" / "a.json")
+    assert json_doc["id"] == 0
+    cols = json_doc["recordSet"][0]["field"]
+    assert [col["id"] for col in cols] == metadata.doc_to_cols[0].tolist()
+    assert cols[1]["histogram"]["id"] == cols[1]["id"]
+
+    # Documents that already contain their IDs are not written again
+    mtime = (tmp_path / "croissant" / "a.json").stat().st_mtime_ns
+    generate_metadata(
+        tmp_path / "croissant",
+        tmp_path / "metadata.json",
+        tmp_path / "tantivy",
+        return_documents=False,
+        workers=2,
+    )
+    assert (tmp_path / "croissant" / "a.json").stat().st_mtime_ns == mtime
+    assert load_json(tmp_path / "metadata.json") == metadata.model_dump(mode="json")
+
+
+def test_metadata_malformed_histogram(tmp_path: Path) -> None:
+    malformed_column = column("Rainfall", [0.5, 0.5])
+    del malformed_column["histogram"]["bins"]
+    hists, metadata = load_metadata(
+        {
+            "a": [column("City"), column("Age", [0.2, 0.8])],
+            "b": [column("Year", [1.0]), malformed_column, column("Month", [1.0])],
+            "c": [column("Country", [0.5, 0.5])],
+        },
+        tmp_path,
+    )
+
+    # The ingestion continues after the malformed histogram and skips the rest of its document
+    assert [int(hist_id) for hist_id, _ in hists] == [0, 1, 4]
+    assert [bins.tolist() for _, (_, bins) in hists] == [[0, 1, 2], [0, 1], [0, 1, 2]]
+    assert metadata.col_to_doc.tolist() == [0, 1, 1, 1, 2, 0]
+    assert list(metadata.name_to_vector) == ["City", "Age", "Year", "Country"]
+    assert [cols.tolist() for cols in metadata.vector_to_cols] == [[5], [0], [1], [4]]
+
+
+def test_metadata_null_histogram(tmp_path: Path) -> None:
+    null_column = column("Rainfall")
+    null_column["histogram"] = None
+    hists, metadata = load_metadata(
+        {"a": [null_column, column("Age", [0.2, 0.8])], "b": [column("Year", [1.0])]}, tmp_path
+    )
+
+    # A null histogram is treated like a missing one in both passes
+    assert [int(hist_id) for hist_id, _ in hists] == [0, 1]
+    assert metadata.num_hists == len(hists)
+    assert [cols.tolist() for cols in metadata.doc_to_cols] == [[2, 0], [1]]
+
+
+def test_metadata_empty_collection(tmp_path: Path) -> None:
+    hists, metadata = load_metadata({}, tmp_path)
+
+    assert hists == []
+    assert metadata.num_hists == 0
+    assert metadata.doc_to_cols == []
+    assert metadata.col_to_doc.size == 0
+    assert metadata.name_to_vector == {}
+    assert metadata.vector_to_cols == []
@@ -0,0 +1,56 @@
+from pathlib import Path
+
+import pytest
+import tantivy
+
+from backend.indices import TantivyIndex
+
+
+@pytest.fixture
+def tantivy_index(tmp_path: Path) -> TantivyIndex:
+    tantivy_index = TantivyIndex(index_path=tmp_path / "tantivy", recreate=True)
+    writer = tantivy_index.writer()
+    for doc in (
+        {"id": 0, "name": "Heart disease", "usability": 0.9},
+        {"id": 1, "name": "Heart rate", "description": "Heart rate data", "usability": 0.2},
+        {"id": 2, "name": "Weather", "usability": 1.0},
+    ):
+        writer.add_document(tantivy.Document.from_dict(doc, tantivy_index.schema))
+    writer.commit()
+    writer.wait_merging_threads()
+    tantivy_index.index.reload()
+    return tantivy_index
+
+
+def test_writer_with_many_threads(tmp_path: Path) -> None:
+    tantivy_index = TantivyIndex(index_path=tmp_path / "tantivy", recreate=True)
+
+    # More threads than the heap of the writer can support must not be rejected by Tantivy
+    writer = tantivy_index.writer(num_threads=256)
+    writer.add_document(
+        tantivy.Document.from_dict(
+            {"id": 0, "name": "Heart disease", "usability": 1.0}, tantivy_index.schema
+        )
+    )
+    writer.commit()
+    writer.wait_merging_threads()
+    tantivy_index.index.reload()
+
+    doc_ids, _, _ = tantivy_index.search("heart")
+    assert doc_ids.tolist() == [0]
+
+
+def test_min_usability_score(tantivy_index: TantivyIndex) -> None:
+    doc_ids, scores, _ = tantivy_index.search("heart", rank_by_usability=False)
+    assert sorted(doc_ids.tolist()) == [0, 1]
+
+    # Documents below the usability threshold are dropped without changing the other scores
+    filtered_ids, filtered_scores, _ = tantivy_index.search(
+        "heart", min_usability_score=0.5, rank_by_usability=False
+    )
+    assert filtered_ids.tolist() == [0]
+    assert filtered_scores.tolist() == scores[doc_ids == 0].tolist()
+
+    # The threshold is inclusive
+    filtered_ids, _, _ = tantivy_index.search("heart", min_usability_score=0.9)
+    assert filtered_ids.tolist() == [0]
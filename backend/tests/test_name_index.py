@@ -0,0 +1,122 @@
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import hnswlib
+import numpy as np
+import pytest
+
+from backend.config import Metadata, Settings
+from backend.indices import HnswIndex, name_op
+from backend.indices.name_op import INDEX_MANIFEST_FILE, canonicalize_name
+from backend.utils import dump_json
+
+if TYPE_CHECKING:
+    from .conftest import FakeEmbedder
+
+
+@pytest.fixture
+def metadata() -> Metadata:
+    settings = Settings(
+        data_dir=Path(__file__).parent / "assets",
+        collection_name="toy_collection",
+        _env_file=None,  # type: ignore[call-arg]
+    )
+    with settings.metadata_path.open("rb") as f:
+        return Metadata.model_validate_json(f.read())
+
+
+def build_hnsw_index(
+    embedder: "type[FakeEmbedder]",
+    tmp_path: Path,
+    metadata: Metadata,
+    canonicalize_names: bool = False,
+    quantization: str | None = None,
+) -> HnswIndex:
+    names = list(metadata.name_to_vector)
+    if canonicalize_names:
+        names = [canonicalize_name(name) for name in names]
+    index = hnswlib.Index(space="cosine", dim=embedder.dim)
+    index.init_index(max_elements=len(names), random_seed=42)
+    index.add_items(
+        np.array([embedder.embed(name) for name in names]),
+        np.array(list(metadata.name_to_vector.values()), dtype=np.uint64),
+    )
+    index_path = tmp_path / "index.bin"
+    index.save_index(index_path.as_posix())
+    dump_json(
+        {"canonicalize_names": canonicalize_names, "quantization": quantization},
+        tmp_path / INDEX_MANIFEST_FILE,
+    )
+
+    return HnswIndex(path=index_path, metadata=metadata)
+
+
+@pytest.fixture
+def hnsw_index(
+    fake_embedder: "type[FakeEmbedder]", tmp_path: Path, metadata: Metadata
+) -> HnswIndex:
+    return build_hnsw_index(fake_embedder, tmp_path, metadata)
+
+
+@pytest.mark.parametrize("k", [1, 3, 10])
+def test_neighbor_columns(
+    fake_embedder: "type[FakeEmbedder]", hnsw_index: HnswIndex, metadata: Metadata, k: int
+) -> None:
+    # Brute-force the nearest names, including the queried name itself
+    names = list(metadata.name_to_vector)
+    embeddings = np.array([fake_embedder.embed(name) for name in names])
+    similarities = embeddings @ fake_embedder.embed("Latitude")
+    neighbors = [names[i] for i in np.argsort(-similarities)[: k + 1]]
+    expected = {
+        int(col_id)
+        for name in neighbors
+        for col_id in metadata.vector_to_cols[metadata.name_to_vector[name]]
+    }
+
+    result = hnsw_index.search("Latitude", k, None)
+
+    assert result.dtype == np.uint32
+    assert len(result) == len(expected)
+    assert set(result.tolist()) == expected
+
+
+def test_exact_columns(hnsw_index: HnswIndex, metadata: Metadata) -> None:
+    for name, vector_id in metadata.name_to_vector.items():
+        result = hnsw_index.search(name, 0, None)
+        assert sorted(result.tolist()) == sorted(metadata.vector_to_cols[vector_id].tolist())
+
+    assert hnsw_index.search("Unknown column", 0, None).size == 0
+
+
+def test_canonicalized_query(
+    fake_embedder: "type[FakeEmbedder]", tmp_path: Path, metadata: Metadata
+) -> None:
+    hnsw_index = build_hnsw_index(fake_embedder, tmp_path, metadata, canonicalize_names=True)
+
+    # The query is canonicalized like the indexed names, so it matches the name exactly
+    result = hnsw_index.search("  LATITUDE ", 1, None)
+
+    latitude_cols = metadata.vector_to_cols[metadata.name_to_vector["Latitude"]]
+    assert sorted(result.tolist()) == sorted(latitude_cols.tolist())
+
+
+@pytest.mark.parametrize("quantization", [None, "int8"])
+def test_query_quantization(
+    fake_embedder: "type[FakeEmbedder]",
+    tmp_path: Path,
+    metadata: Metadata,
+    monkeypatch: pytest.MonkeyPatch,
+    quantization: str | None,
+) -> None:
+    quantized: list[object] = []
+    monkeypatch.setattr(
+        name_op.torch.ao.quantization,
+        "quantize_dynamic",
+        lambda model, *_, **__: quantized.append(model),  # pyright: ignore[reportUnknownLambdaType]
+    )
+    hnsw_index = build_hnsw_index(fake_embedder, tmp_path, metadata, quantization=quantization)
+
+    hnsw_index.search("Latitude", 1, None)
+
+    # The query model is only quantized if the index was built with a quantized model
+    assert len(quantized) == (quantization is not None)